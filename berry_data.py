@@ -0,0 +1,103 @@
+import bisect
+import csv
+import math
+import re
+from collections import Counter
+
+# Star thresholds and multipliers
+starRatings = [0, 120, 240, 400, 700, 960]
+
+
+def get_star_rating(flavor_score):
+    rating = bisect.bisect_right(starRatings, flavor_score) - 1
+    return rating, 1 + 0.1 * rating
+
+
+# ----------------------------------------------------
+# Data loading
+# ----------------------------------------------------
+def load_berries(file_path='hyper_berries.csv'):
+    berries = []
+    with open(file_path, mode='r') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            original_index = int(row['Index'])
+            name = row['Berry Name'].strip()
+            nameMatch = re.search(r"Hyper (\w+) Berry", name)
+            if nameMatch:
+                name = f"H-{nameMatch.group(1)}"
+            if not name:
+                continue
+            try:
+                sweet = int(row['Sweet Score'])
+                spicy = int(row['Spicy Score'])
+                sour = int(row['Sour Score'])
+                bitter = int(row['Bitter Score'])
+                fresh = int(row['Fresh Score'])
+                flavor_total = sweet + spicy + sour + bitter + fresh
+
+                levels = int(row['Levels'])
+                calories = int(row['Calories'])
+                count = int(row.get('Count', 0))  # available inventory
+
+                berries.append((
+                    original_index,  # 0: original CSV index
+                    name,            # 1: berry name
+                    flavor_total,    # 2: total flavor
+                    levels,          # 3: levels
+                    calories,        # 4: calories
+                    count,           # 5: inventory count
+                    sweet,           # 6: sweet
+                    spicy,           # 7: spicy
+                    sour,            # 8: sour
+                    bitter,          # 9: bitter
+                    fresh            # 10: fresh
+                ))
+            except (ValueError, KeyError) as e:
+                print(f"Skipping invalid row for '{name}': {e}")
+                continue
+
+    # Sort descending by total flavor score FOR SEARCH PERFORMANCE (but we'll re-sort for display)
+    berries.sort(key=lambda x: x[2], reverse=True)
+    return berries
+
+
+# ----------------------------------------------------
+# Result records
+# ----------------------------------------------------
+FLAVOR_NAMES = ["Sweet", "Spicy", "Sour", "Bitter", "Fresh"]
+
+
+def build_donut(names, counts, path, cur_flavor, cur_levels, cur_cal,
+                cur_sweet, cur_spicy, cur_sour, cur_bitter, cur_fresh):
+    """Turn a finished path (list of berry positions) into a result dict."""
+    name_counts = Counter()
+    total_used_inventory = 0
+    for idx, cnt in Counter(path).items():
+        name_counts[names[idx]] = cnt
+        total_used_inventory += counts[idx] # inventory of each unique berry
+
+    rating, mult = get_star_rating(cur_flavor)
+    bonus_levels = math.floor(cur_levels * mult)
+    total_cal = int(cur_cal * mult)
+    flavor_values = [cur_sweet, cur_spicy, cur_sour, cur_bitter, cur_fresh]
+    max_single = max(flavor_values)
+    max_flavor_name = FLAVOR_NAMES[flavor_values.index(max_single)]
+
+    return {
+        'name_counts': name_counts,
+        'flavor': cur_flavor,
+        'stars': rating,
+        'bonus_levels': bonus_levels,
+        'calories': total_cal,
+        'unique_berries': len(name_counts),
+        'inventory_sum': total_used_inventory,
+        # Individual flavor scores
+        'sweet': cur_sweet,
+        'spicy': cur_spicy,
+        'sour': cur_sour,
+        'bitter': cur_bitter,
+        'fresh': cur_fresh,
+        'max_flavor_value': max_single,
+        'max_flavor_type': max_flavor_name,
+    }
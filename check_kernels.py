@@ -0,0 +1,62 @@
+import contextlib
+import io
+
+from berry_data import load_berries
+from custom_donut_finder import find_high_score_donuts
+from donut_solver import load_items, iter_combo_totals_delta, match_values
+from search_kernel import find_donuts_kernel, numba, scan_combinations, start_index
+
+
+# ----------------------------------------------------
+# Kernel equivalence check: python check_kernels.py
+# ----------------------------------------------------
+def check_kernels(berry_file='hyper_berries.csv', solver_file='hyper_berries.csv'):
+    """
+    Compare both kernels, on every available path (pure Python and Numba),
+    with the searches they replace. Returns True when everything matches.
+    """
+    paths = [False] + ([True] if numba is not None else [])
+    if numba is None:
+        print("Numba not installed: checking the pure-Python path only.")
+    ok = True
+
+    berries = load_berries(berry_file)
+    for num, target, stars, flavors in [(3, 0, "all", "all"), (5, 400, [3, 4], "all"),
+                                        (8, 400, [3, 4], ["Sweet", "Spicy"])]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected, _ = find_high_score_donuts(berries, target, num_berries=num,
+                                                 include_stars=stars, include_flavors=flavors)
+        for jit in paths:
+            with contextlib.redirect_stdout(io.StringIO()):
+                got, _ = find_donuts_kernel(berries, target, num_berries=num, include_stars=stars,
+                                            include_flavors=flavors, use_jit=jit)
+            same = got == expected
+            ok = ok and same
+            print(f"find  size {num} ({'Numba' if jit else 'pure Python'}): "
+                  f"{'OK' if same else 'MISMATCH'} ({len(expected):,} donuts)")
+
+    items = load_items(solver_file)
+    for r, threshold, match_count, targets in [(3, 100, 2, [0, 1, 2, 3, 4]), (5, 200, 2, [1]),
+                                               (5, 150, 3, [0, 1, 2, 3, 4])]:
+        expected = [tuple(combo) for combo, totals in iter_combo_totals_delta(items, r)
+                    if match_values(totals, targets, threshold, match_count)]
+        for jit in paths:
+            # Small odd chunks so resuming mid-carry is exercised too
+            idx = start_index(r, jit)
+            got = []
+            done = False
+            while not done:
+                _, done, matches = scan_combinations(items, r, idx, 997, threshold, match_count,
+                                                     targets, use_jit=jit)
+                got.extend(matches)
+            same = got == expected
+            ok = ok and same
+            print(f"scan  size {r} ({'Numba' if jit else 'pure Python'}): "
+                  f"{'OK' if same else 'MISMATCH'} ({len(expected):,} matches)")
+
+    return ok
+
+
+if __name__ == "__main__":
+    if not check_kernels():
+        raise SystemExit(1)
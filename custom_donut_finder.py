@@ -1,68 +1,32 @@
-import csv
 from collections import Counter
 from datetime import datetime
 from tabulate import tabulate # pip install tabulate
 import time
 import math
-import bisect
-import re
+import heapq
+import itertools
 
-# Star thresholds and multipliers
-starRatings = [0, 120, 240, 400, 700, 960]
-
-
-def get_star_rating(flavor_score):
-    rating = bisect.bisect_right(starRatings, flavor_score) - 1
-    return rating, 1 + 0.1 * rating
+from berry_data import starRatings, get_star_rating, load_berries, build_donut
+from recipe_counter import count_berry_recipes, count_matching
+from search_kernel import find_donuts_kernel
 
 
 # ----------------------------------------------------
-# Data loading
+# Result filters
 # ----------------------------------------------------
-def load_berries(file_path='hyper_berries.csv'):
-    berries = []
-    with open(file_path, mode='r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            original_index = int(row['Index'])
-            name = row['Berry Name'].strip()
-            nameMatch = re.search(r"Hyper (\w+) Berry", name)
-            if nameMatch:
-                name = f"H-{nameMatch.group(1)}"
-            if not name:
-                continue
-            try:
-                sweet = int(row['Sweet Score'])
-                spicy = int(row['Spicy Score'])
-                sour = int(row['Sour Score'])
-                bitter = int(row['Bitter Score'])
-                fresh = int(row['Fresh Score'])
-                flavor_total = sweet + spicy + sour + bitter + fresh
-
-                levels = int(row['Levels'])
-                calories = int(row['Calories'])
-                count = int(row.get('Count', 0))  # available inventory
-
-                berries.append((
-                    original_index,  # 0: original CSV index
-                    name,            # 1: berry name
-                    flavor_total,    # 2: total flavor
-                    levels,          # 3: levels
-                    calories,        # 4: calories
-                    count,           # 5: inventory count
-                    sweet,           # 6: sweet
-                    spicy,           # 7: spicy
-                    sour,            # 8: sour
-                    bitter,          # 9: bitter
-                    fresh            # 10: fresh
-                ))
-            except (ValueError, KeyError) as e:
-                print(f"Skipping invalid row for '{name}': {e}")
-                continue
-
-    # Sort descending by total flavor score FOR SEARCH PERFORMANCE (but we'll re-sort for display)
-    berries.sort(key=lambda x: x[2], reverse=True)
-    return berries
+def donut_matches(donut, include_stars="all", include_flavors="all"):
+    return ((include_stars == "all" or donut['stars'] in include_stars) and
+            (include_flavors == "all" or donut['max_flavor_type'] in include_flavors))
+
+
+def star_flavor_cap(include_stars="all"):
+    """Highest flavor total that can still land in one of include_stars."""
+    if include_stars == "all" or not include_stars:
+        return math.inf
+    top = max(include_stars)
+    if top + 1 >= len(starRatings):
+        return math.inf
+    return starRatings[top + 1] - 1
 
 
 # ----------------------------------------------------
@@ -90,50 +54,17 @@ def find_high_score_donuts(berries, target, num_berries=8, include_stars="all",
                path, remaining_counts):
         nonlocal best_min_found
 
-        if pos == len(scores):
-            if remaining == 0:
-                if cur_flavor >= best_min_found:
-                    name_counts = Counter()
-                    for idx, cnt in Counter(path).items():
-                        name_counts[names[idx]] = cnt
-
-                    total_used_inventory = 0
-                    for berry_name in name_counts:
-                        idx = names.index(berry_name)
-                        total_used_inventory += counts[idx] # inventory of each unique berry
-
-                    rating, mult = get_star_rating(cur_flavor)
-                    bonus_levels = math.floor(cur_levels * mult)
-                    total_cal = int(cur_cal * mult)
-                    max_single = max(cur_sweet, cur_spicy, cur_sour, cur_bitter, cur_fresh)
-                    max_flavor_name = ["Sweet", "Spicy", "Sour", "Bitter", "Fresh"][
-                        [cur_sweet, cur_spicy, cur_sour, cur_bitter, cur_fresh].index(max_single)
-                    ]
-
-                    if (include_stars == "all" or rating in include_stars) and (include_flavors == "all" or max_flavor_name in include_flavors):
-                        results.append({
-                            'name_counts': name_counts,
-                            'flavor': cur_flavor,
-                            'stars': rating,
-                            'bonus_levels': bonus_levels,
-                            'calories': total_cal,
-                            'unique_berries': len(name_counts),
-                            'inventory_sum': total_used_inventory,
-                            # Individual flavor scores
-                            'sweet': cur_sweet,
-                            'spicy': cur_spicy,
-                            'sour': cur_sour,
-                            'bitter': cur_bitter,
-                            'fresh': cur_fresh,
-                            'max_flavor_value': max_single,
-                            'max_flavor_type': max_flavor_name,
-                        })
-
+        if remaining == 0:
+            if cur_flavor >= best_min_found:
+                donut = build_donut(names, counts, path, cur_flavor, cur_levels, cur_cal,
+                                    cur_sweet, cur_spicy, cur_sour, cur_bitter, cur_fresh)
+                if donut_matches(donut, include_stars, include_flavors):
+                    results.append(donut)
                     if cur_flavor > best_min_found:
                         best_min_found = cur_flavor
             return
 
-        if remaining == 0:
+        if pos == len(scores):
             return
 
         # Pruning: can't reach target even if we take max of everything left
@@ -180,6 +111,263 @@ def find_high_score_donuts(berries, target, num_berries=8, include_stars="all",
     return results, elapsed
 
 
+# ----------------------------------------------------
+# One traversal for several sizes and queries
+# ----------------------------------------------------
+def find_donuts_multi(berries, queries, sizes=range(3, 9), time_limit=None):
+    """
+    Answer several searches in a single walk of the prefix tree.
+
+    queries is a list of dicts with 'target' and optional 'include_stars' /
+    'include_flavors' (default "all"). A recipe is emitted at the position of
+    its last berry, so every size in sizes comes out of the same walk, and
+    each one is routed to the queries it satisfies. Returns (results, elapsed)
+    where results[q] holds what find_high_score_donuts would return for
+    queries[q] at each size, in ascending size order. Raises TimeoutError
+    if time_limit seconds pass before the walk finishes.
+    """
+    start_time = time.perf_counter()
+    deadline = None if time_limit is None else start_time + time_limit
+
+    names = [b[1] for b in berries]
+    scores = [b[2] for b in berries]
+    levels_list = [b[3] for b in berries]
+    cal_list = [b[4] for b in berries]
+    counts = [b[5] for b in berries]
+    sweets = [b[6] for b in berries]
+    spicies = [b[7] for b in berries]
+    sours = [b[8] for b in berries]
+    bitters = [b[9] for b in berries]
+    freshes = [b[10] for b in berries]
+
+    sizes = sorted(set(sizes))
+    if not sizes or sizes[0] < 1:
+        raise ValueError("sizes must hold at least one size, all of them ≥ 1")
+    max_size = max(sizes)
+    stars = [q.get('include_stars', "all") for q in queries]
+    flavors = [q.get('include_flavors', "all") for q in queries]
+
+    # Running best per (query, size) as in find_high_score_donuts, plus the
+    # lowest of them per size, which is what pruning has to beat
+    best = [{size: q['target'] for size in sizes} for q in queries]
+    floor = {size: min(b[size] for b in best) for size in sizes}
+    found = [{size: [] for size in sizes} for _ in queries]
+
+    sizes_above = [[size for size in sizes if size > used] for used in range(max_size + 1)]
+
+    def alive(pos, used, cur_flavor):
+        # Can some size still beat its weakest query from here?
+        score = scores[pos]
+        for size in sizes_above[used]:
+            if cur_flavor + score * (size - used) >= floor[size]:
+                return True
+        return False
+
+    nodes = 0
+
+    def search(pos, used, cur_flavor, cur_levels, cur_cal,
+               cur_sweet, cur_spicy, cur_sour, cur_bitter, cur_fresh,
+               path, is_new):
+        # is_new: the last step added berries, so this prefix is a recipe
+        # that hasn't been seen at any shallower node
+        nonlocal nodes
+        if deadline is not None:
+            # Look at the clock every 1024 nodes only
+            nodes += 1
+            if not nodes & 1023 and time.perf_counter() >= deadline:
+                raise TimeoutError(f"find_donuts_multi did not finish within {time_limit:.2f}s")
+        if is_new and used in floor and cur_flavor >= floor[used]:
+            # Route by flavor and star rating first so the result dict is
+            # only built for recipes some query can still take
+            rating = get_star_rating(cur_flavor)[0]
+            wanting = [q for q in range(len(queries))
+                       if cur_flavor >= best[q][used] and (stars[q] == "all" or rating in stars[q])]
+            if wanting:
+                donut = build_donut(names, counts, path, cur_flavor, cur_levels, cur_cal,
+                                    cur_sweet, cur_spicy, cur_sour, cur_bitter, cur_fresh)
+                raised = False
+                for q in wanting:
+                    if flavors[q] == "all" or donut['max_flavor_type'] in flavors[q]:
+                        found[q][used].append(donut)
+                        if cur_flavor > best[q][used]:
+                            best[q][used] = cur_flavor
+                            raised = True
+                if raised:
+                    floor[used] = min(b[used] for b in best)
+
+        if used == max_size or pos == len(scores):
+            return
+
+        # Pruning: no size can reach its target even taking max of everything left
+        if not alive(pos, used, cur_flavor):
+            return
+
+        max_take = min(max_size - used, counts[pos])
+
+        for take in range(max_take + 1):
+            # Early break if even taking max future won't help
+            if take < max_take and not alive(pos, used, cur_flavor):
+                break
+
+            search(pos + 1, used + take,
+                   cur_flavor + take * scores[pos],
+                   cur_levels + take * levels_list[pos],
+                   cur_cal + take * cal_list[pos],
+                   cur_sweet + take * sweets[pos],
+                   cur_spicy + take * spicies[pos],
+                   cur_sour + take * sours[pos],
+                   cur_bitter + take * bitters[pos],
+                   cur_fresh + take * freshes[pos],
+                   path + [pos] * take, take > 0)
+
+    search(0, 0, 0, 0, 0, 0, 0, 0, 0, 0, [], True)
+
+    results = [[donut for size in sizes for donut in per_size[size]] for per_size in found]
+    elapsed = time.perf_counter() - start_time
+    print(f"Answered {len(queries)} queries for sizes {sizes[0]}–{sizes[-1]} in {elapsed:.2f} seconds")
+    for q, query_results in enumerate(results):
+        print(f"  query {q + 1}: {len(query_results):,} donuts ≥ {queries[q]['target']} flavor")
+
+    return results, elapsed
+
+
+# ----------------------------------------------------
+# Anytime best-first search with a wall-clock budget
+# ----------------------------------------------------
+def anytime_bounds(berries, num_berries, include_stars="all"):
+    """
+    Tables find_high_score_donuts_anytime prunes with, returned as
+    (cap, fill_bound, fill_floor) so callers can reuse them across queries.
+    """
+    scores = [b[2] for b in berries]
+    counts = [b[5] for b in berries]
+    n = len(berries)
+
+    # Every flavor total is a multiple of the scores' gcd, so the star cap
+    # can be rounded down to one without losing any donut
+    step = math.gcd(*scores) or 1
+    cap = star_flavor_cap(include_stars)
+    if cap != math.inf:
+        cap -= cap % step
+
+    # fill_bound[pos][r] / fill_floor[pos][r]: most / least flavor r more
+    # berries from pos onward can add within inventory (-inf / inf if the
+    # inventory left can't supply r berries)
+    fill_bound = [[-math.inf] * (num_berries + 1) for _ in range(n + 1)]
+    fill_floor = [[math.inf] * (num_berries + 1) for _ in range(n + 1)]
+    fill_bound[n][0] = fill_floor[n][0] = 0
+    for pos in range(n - 1, -1, -1):
+        for r in range(num_berries + 1):
+            most, least = -math.inf, math.inf
+            for take in range(min(r, counts[pos]) + 1):
+                most = max(most, take * scores[pos] + fill_bound[pos + 1][r - take])
+                least = min(least, take * scores[pos] + fill_floor[pos + 1][r - take])
+            fill_bound[pos][r] = most
+            fill_floor[pos][r] = least
+
+    return cap, fill_bound, fill_floor
+
+
+def find_high_score_donuts_anytime(berries, target, num_berries=8, include_stars="all",
+                                   include_flavors="all", time_limit=None, on_result=None,
+                                   bounds=None):
+    """
+    Best-first variant of find_high_score_donuts that can stop at a deadline.
+
+    Open branches are expanded highest flavor bound first instead of in index
+    order, so strong donuts turn up early. As in find_high_score_donuts, a
+    donut is kept when it is at least as good as the best found so far, and
+    each one kept is passed to on_result(donut) as soon as it is found.
+    bounds takes anytime_bounds(berries, num_berries, include_stars) computed
+    earlier; by default they are built here.
+
+    Returns (results, elapsed, upper_bound, gap). upper_bound is the highest
+    flavor an unexplored donut could still have, gap is upper_bound minus the
+    best flavor found (minus target when nothing was found). When the search
+    runs to completion gap is 0 and the best flavor found is optimal.
+    """
+    start_time = time.perf_counter()
+    deadline = None if time_limit is None else start_time + time_limit
+
+    names = [b[1] for b in berries]
+    scores = [b[2] for b in berries]
+    levels_list = [b[3] for b in berries]
+    cal_list = [b[4] for b in berries]
+    counts = [b[5] for b in berries]
+    flavor_cols = [[b[6 + i] for b in berries] for i in range(5)]
+
+    if bounds is None:
+        bounds = anytime_bounds(berries, num_berries, include_stars)
+    cap, fill_bound, fill_floor = bounds
+
+    results = []
+    best_min_found = target
+    heap = []
+    tie_break = itertools.count()
+
+    def push(pos, remaining, flavor, levels, cal, tastes, path):
+        nonlocal best_min_found
+        if flavor + fill_floor[pos][remaining] > cap:
+            return  # every donut below here has too many stars
+
+        # Complete donuts are scored right away so the incumbent improves
+        # while higher-bound branches are still open
+        if remaining == 0:
+            if flavor >= best_min_found:
+                donut = build_donut(names, counts, path, flavor, levels, cal, *tastes)
+                if donut_matches(donut, include_stars, include_flavors):
+                    results.append(donut)
+                    best_min_found = max(best_min_found, flavor)
+                    if on_result is not None:
+                        on_result(donut)
+            return
+
+        bound = min(cap, flavor + fill_bound[pos][remaining])
+        if bound >= best_min_found:
+            # Ties go to the deepest, most recent node so the search dives
+            # to complete donuts instead of widening the frontier
+            heapq.heappush(heap, (-bound, remaining, -next(tie_break), pos, remaining,
+                                  flavor, levels, cal, tastes, path))
+
+    push(0, num_berries, 0, 0, 0, (0, 0, 0, 0, 0), [])
+
+    timed_out = False
+    while heap:
+        if -heap[0][0] < best_min_found:
+            heap.clear()  # nothing left can reach the best found so far
+            break
+        if deadline is not None and time.perf_counter() >= deadline:
+            timed_out = True
+            break
+
+        _, _, _, pos, remaining, flavor, levels, cal, tastes, path = heapq.heappop(heap)
+        for take in range(min(remaining, counts[pos]) + 1):
+            push(pos + 1, remaining - take,
+                 flavor + take * scores[pos],
+                 levels + take * levels_list[pos],
+                 cal + take * cal_list[pos],
+                 tuple(tastes[i] + take * flavor_cols[i][pos] for i in range(5)),
+                 path + [pos] * take)
+
+    best_found = max((r['flavor'] for r in results), default=None)
+    if timed_out:
+        upper_bound = max(-heap[0][0], best_min_found)
+        gap = upper_bound - (best_found if best_found is not None else target)
+    else:
+        upper_bound = best_found
+        gap = 0
+
+    elapsed = time.perf_counter() - start_time
+    status = "stopped at time limit" if timed_out else "complete"
+    print(f"Found {len(results):,} donuts ≥ {target} flavor in {elapsed:.2f} seconds ({status})")
+    if results:
+        print(f"Best flavor found: {best_found}")
+    if timed_out:
+        print(f"Upper bound: {upper_bound} (gap {gap})")
+
+    return results, elapsed, upper_bound, gap
+
+
 # ----------------------------------------------------
 # Output
 # ----------------------------------------------------
@@ -276,22 +464,60 @@ if __name__ == "__main__":
     ONLY_STAR_RATING = [3, 4]           # or "all"
     ONLY_FLAVORS     = "all"
     # ONLY_FLAVORS     = ["Spicy", "Bitter", "Fresh"]   # or "all"
+    TIME_LIMIT       = None             # seconds per size: switches to the anytime search
+    USE_KERNEL       = False            # flat-array search_kernel (Numba-compiled when installed)
+    USE_JIT          = None             # kernel only: None = auto, True/False = force Numba/pure Python
+
+    # Size of the search space up front, without enumerating it: every recipe
+    # ≥ TARGET_FLAVOR in the requested star ratings, whatever its dominant
+    # flavor. The searches only keep recipes at least as good as the best
+    # found so far, so they return far fewer than this.
+    recipe_counts = count_berry_recipes(berries, MAX_BERRIES)
+    search_space = count_matching(recipe_counts, range(MIN_BERRIES, MAX_BERRIES + 1),
+                                  TARGET_FLAVOR, ONLY_STAR_RATING)
+    print(f"Search space: {search_space:,} recipes ≥ {TARGET_FLAVOR} flavor in the requested star ratings "
+          f"(any dominant flavor)")
 
     all_results = []
     total_time = 0
 
-    for num in range(MIN_BERRIES, MAX_BERRIES + 1):
-        print(f"\nSearching for {num}-berry donuts ≥ {TARGET_FLAVOR} flavor ...")
-        results, elapsed = find_high_score_donuts(
+    if TIME_LIMIT is None and not USE_KERNEL:
+        # Every size comes out of one walk of the prefix tree
+        print(f"\nSearching for {MIN_BERRIES}–{MAX_BERRIES}-berry donuts ≥ {TARGET_FLAVOR} flavor ...")
+        (all_results,), total_time = find_donuts_multi(
             berries,
-            TARGET_FLAVOR,
-            num_berries = num,
-            include_stars = ONLY_STAR_RATING,
-            include_flavors = ONLY_FLAVORS
+            [{'target': TARGET_FLAVOR, 'include_stars': ONLY_STAR_RATING, 'include_flavors': ONLY_FLAVORS}],
+            sizes = range(MIN_BERRIES, MAX_BERRIES + 1)
         )
-        total_time += elapsed
-        all_results.extend(results)
-        print(f"  → found {len(results)} recipes in {elapsed:.2f}s")
+        found_per_size = Counter(sum(r['name_counts'].values()) for r in all_results)
+        for num in range(MIN_BERRIES, MAX_BERRIES + 1):
+            print(f"  {num}-berry: found {found_per_size[num]:,} recipes "
+                  f"(search space {count_matching(recipe_counts, [num], TARGET_FLAVOR, ONLY_STAR_RATING):,})")
+    else:
+        for num in range(MIN_BERRIES, MAX_BERRIES + 1):
+            print(f"\nSearching for {num}-berry donuts ≥ {TARGET_FLAVOR} flavor "
+                  f"(search space {count_matching(recipe_counts, [num], TARGET_FLAVOR, ONLY_STAR_RATING):,} recipes) ...")
+            if TIME_LIMIT is None:
+                results, elapsed = find_donuts_kernel(
+                    berries,
+                    TARGET_FLAVOR,
+                    num_berries = num,
+                    include_stars = ONLY_STAR_RATING,
+                    include_flavors = ONLY_FLAVORS,
+                    use_jit = USE_JIT
+                )
+            else:
+                results, elapsed, upper_bound, gap = find_high_score_donuts_anytime(
+                    berries,
+                    TARGET_FLAVOR,
+                    num_berries = num,
+                    include_stars = ONLY_STAR_RATING,
+                    include_flavors = ONLY_FLAVORS,
+                    time_limit = TIME_LIMIT
+                )
+            total_time += elapsed
+            all_results.extend(results)
+            print(f"  → found {len(results)} recipes in {elapsed:.2f}s")
 
     print(f"\nTotal recipes found: {len(all_results)}")
     print(f"Total search time: {total_time:.2f}s")
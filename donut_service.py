@@ -0,0 +1,448 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import search_kernel
+from berry_data import load_berries, FLAVOR_NAMES
+from custom_donut_finder import find_donuts_multi, find_high_score_donuts_anytime, anytime_bounds
+from donut_solver import INPUT_FILE, SCORE_COLUMNS, load_items, match_values, multiset_count
+from recipe_counter import count_berry_recipes, count_by_stars, count_matching
+
+# --- CONFIGURATION ---
+BERRY_FILE = 'hyper_berries.csv'    # Table for /find and /count (custom_donut_finder format)
+HOST = '127.0.0.1'
+PORT = 8765
+WORKERS = os.cpu_count() or 2       # Processes answering /find and /solve
+DEFAULT_TIMEOUT = 10                # Seconds per request unless the request asks for less/more
+MAX_TIMEOUT = 120
+CACHE_SIZE = 128                    # Completed results kept in memory
+LATENCY_SAMPLES = 1000              # Recent requests per endpoint used for the percentiles
+SCAN_CHUNK = 10000                  # Combinations per kernel call between deadline checks
+MAX_COUNT_BERRIES = 20              # /count: largest size; the table is built once at startup
+EXACT_SHARE = 0.8                   # /find: share of the budget for the exhaustive walk before
+                                    # falling back to the anytime search
+# ---------------------
+
+
+# ----------------------------------------------------
+# Worker side (one process each, tables loaded once)
+# ----------------------------------------------------
+_berries = None
+_solver_items = {}
+_bounds = {}   # (size, include_stars) -> anytime_bounds tables
+
+
+def _init_worker(berry_file, solver_file, warmed):
+    global _berries
+    _berries = load_berries(berry_file)
+
+    # Load the default solver table and run the scan kernel once, so the
+    # first request doesn't pay for the CSV or for loading Numba's code
+    items = _solver_table(solver_file)
+    jit = search_kernel.jit_enabled()
+    search_kernel.scan_combinations(items, 1, search_kernel.start_index(1, jit), 1,
+                                    0, 1, [0], use_jit=jit)
+    warmed.release()
+
+
+def _noop():
+    pass
+
+
+def _solver_table(input_file):
+    # Only plain file names next to the service, loaded once per worker
+    if input_file not in _solver_items:
+        _solver_items[input_file] = load_items(input_file)
+    return _solver_items[input_file]
+
+
+def _donut_json(donut):
+    record = dict(donut)
+    record['name_counts'] = dict(donut['name_counts'])
+    return record
+
+
+def _anytime_bounds(num, include_stars):
+    key = (num, include_stars if include_stars == "all" else tuple(sorted(include_stars)))
+    if key not in _bounds:
+        _bounds[key] = anytime_bounds(_berries, num, include_stars)
+    return _bounds[key]
+
+
+def run_find(params, deadline):
+    """
+    Answer like custom_donut_finder.py when the budget allows.
+
+    The exhaustive find_donuts_multi walk gets EXACT_SHARE of the time left;
+    its answer is identical to the script's (mode "exact"). If it doesn't
+    finish, the rest of the budget goes to the anytime search per size
+    (mode "anytime"). That answer is a different result set: the best-first
+    incumbents rather than every donut find_high_score_donuts keeps, so it
+    always reports complete = false, with the bound and gap per size.
+    """
+    sizes = list(range(params['min_berries'], params['max_berries'] + 1))
+    query = {'target': params['target'], 'include_stars': params['include_stars'],
+             'include_flavors': params['include_flavors']}
+    per_size = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            (results,), _ = find_donuts_multi(_berries, [query], sizes,
+                                              time_limit=(deadline - time.time()) * EXACT_SHARE)
+            mode = 'exact'
+            for num in sizes:
+                per_size[num] = {'found': sum(1 for r in results if sum(r['name_counts'].values()) == num)}
+        except TimeoutError:
+            mode = 'anytime'
+            results = []
+            for i, num in enumerate(sizes):
+                budget = max(deadline - time.time(), 0) / (len(sizes) - i)
+                found, elapsed, upper_bound, gap = find_high_score_donuts_anytime(
+                    _berries, params['target'], num_berries=num,
+                    include_stars=params['include_stars'],
+                    include_flavors=params['include_flavors'],
+                    time_limit=budget, bounds=_anytime_bounds(num, params['include_stars']))
+                per_size[num] = {'found': len(found), 'upper_bound': upper_bound, 'gap': gap}
+                results.extend(found)
+
+    results = sorted(results, key=lambda r: -r['flavor'])
+    return {
+        'complete': mode == 'exact',
+        'mode': mode,
+        'sizes': per_size,
+        'total': len(results),
+        'results': [_donut_json(r) for r in results[:params['limit']]],
+    }
+
+
+def run_solve(params, deadline):
+    """donut_solver scan through the kernel until max_results or the deadline."""
+    items = _solver_table(params['input_file'])
+    r = params['selection_size']
+    target_score_indices = params['target_score_indices']
+    jit = search_kernel.jit_enabled()
+    idx = search_kernel.start_index(r, jit)
+    total = multiset_count(len(items), r)
+
+    checked = 0
+    matches = []
+    done = total == 0
+    while not done and len(matches) < params['max_results'] and time.time() < deadline:
+        n, done, found = search_kernel.scan_combinations(
+            items, r, idx, SCAN_CHUNK, params['min_threshold'], params['target_match_count'],
+            target_score_indices, max_matches=params['max_results'] - len(matches), use_jit=jit)
+        checked += n
+        matches.extend(found)
+
+    recipes = []
+    for combo in matches:
+        totals = tuple(sum(items[i]['scores'][j] for i in combo) for j in range(5))
+        recipes.append({
+            'ingredients': [items[i]['name'] for i in combo],
+            'scores': dict(zip(SCORE_COLUMNS, totals)),
+            'match_values': match_values(totals, target_score_indices,
+                                         params['min_threshold'], params['target_match_count']),
+        })
+    return {
+        'complete': done or len(matches) >= params['max_results'],
+        'checked': checked,
+        'total_combinations': total,
+        'results': recipes,
+    }
+
+
+# ----------------------------------------------------
+# Request parsing
+# ----------------------------------------------------
+def _int(body, key, default, low=0, high=None):
+    value = body.get(key, default)
+    # bool is an int subclass, but JSON true/false is not a number here
+    if not isinstance(value, int) or isinstance(value, bool) or value < low or (high is not None and value > high):
+        raise ValueError(f"'{key}' must be an integer ≥ {low}" + (f" and ≤ {high}" if high is not None else ""))
+    return value
+
+
+def _choice_list(body, key, options):
+    value = body.get(key, "all")
+    if isinstance(value, str) and value.lower() == "all":
+        return "all"
+    if not isinstance(value, list) or not all(v in options for v in value):
+        raise ValueError(f"'{key}' must be \"all\" or a list drawn from {options}")
+    return value
+
+
+def _timeout(body):
+    value = body.get('timeout', DEFAULT_TIMEOUT)
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or not 0 < value <= MAX_TIMEOUT:
+        raise ValueError(f"'timeout' must be a number of seconds in (0, {MAX_TIMEOUT}]")
+    return value
+
+
+def parse_find(body):
+    params = {
+        'target': _int(body, 'target', 400),
+        'min_berries': _int(body, 'min_berries', 3, low=1),
+        'max_berries': _int(body, 'max_berries', 8, low=1, high=20),
+        'include_stars': _choice_list(body, 'include_stars', list(range(6))),
+        'include_flavors': _choice_list(body, 'include_flavors', FLAVOR_NAMES),
+        'limit': _int(body, 'limit', 1000),
+    }
+    if params['min_berries'] > params['max_berries']:
+        raise ValueError("'min_berries' must not exceed 'max_berries'")
+    return params
+
+
+def parse_solve(body):
+    input_file = body.get('input_file', INPUT_FILE)
+    if not isinstance(input_file, str) or os.path.basename(input_file) != input_file \
+            or not input_file.endswith('.csv') or not os.path.exists(input_file):
+        raise ValueError("'input_file' must name a CSV file next to the service")
+    with open(input_file, newline='') as f:
+        header = next(csv.reader(f), [])
+    missing = [col for col in ["Berry Name"] + SCORE_COLUMNS if col not in header]
+    if missing:
+        raise ValueError(f"'{input_file}' is not a donut_solver table (missing columns {missing})")
+    names = body.get('target_score_names', "All")
+    if isinstance(names, str) and names.lower() == "all":
+        target_score_indices = list(range(len(SCORE_COLUMNS)))
+    elif isinstance(names, list) and all(name in SCORE_COLUMNS for name in names):
+        target_score_indices = [SCORE_COLUMNS.index(name) for name in names]
+    else:
+        raise ValueError(f"'target_score_names' must be \"All\" or a list drawn from {SCORE_COLUMNS}")
+    return {
+        'input_file': input_file,
+        'selection_size': _int(body, 'selection_size', 8, low=1, high=20),
+        'min_threshold': _int(body, 'min_threshold', 400),
+        'target_match_count': _int(body, 'target_match_count', 2, low=1, high=5),
+        'target_score_indices': target_score_indices,
+        'max_results': _int(body, 'max_results', 50, low=1),
+    }
+
+
+# ----------------------------------------------------
+# Server side
+# ----------------------------------------------------
+class Metrics:
+    """Per-endpoint request counts, latencies and queue depth."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def _stats(self, endpoint):
+        # Caller holds the lock
+        return self.endpoints.setdefault(endpoint, {
+            'requests': 0, 'errors': 0, 'timeouts': 0, 'cache_hits': 0,
+            'queued': 0, 'max_queued': 0, 'running': 0,
+            'latencies': deque(maxlen=LATENCY_SAMPLES)})
+
+    def waiting(self, endpoint, delta):
+        """Requests waiting for a free worker."""
+        with self.lock:
+            stats = self._stats(endpoint)
+            stats['queued'] += delta
+            stats['max_queued'] = max(stats['max_queued'], stats['queued'])
+
+    def running(self, endpoint, delta):
+        """Requests a worker is busy with."""
+        with self.lock:
+            self._stats(endpoint)['running'] += delta
+
+    def record(self, endpoint, status, seconds, cached=False):
+        with self.lock:
+            stats = self._stats(endpoint)
+            stats['requests'] += 1
+            stats['errors'] += status >= 400 and status != 504
+            stats['timeouts'] += status == 504
+            stats['cache_hits'] += cached
+            stats['latencies'].append(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            endpoints = {}
+            for name, stats in self.endpoints.items():
+                samples = sorted(stats['latencies'])
+                pick = lambda q: round(samples[min(int(q * len(samples)), len(samples) - 1)] * 1000, 2)
+                endpoints[name] = {
+                    'requests': stats['requests'], 'errors': stats['errors'],
+                    'timeouts': stats['timeouts'], 'cache_hits': stats['cache_hits'],
+                    'queue_depth': stats['queued'], 'max_queue_depth': stats['max_queued'],
+                    'running': stats['running'],
+                    'latency_ms': {
+                        'mean': round(sum(samples) / len(samples) * 1000, 2),
+                        'p50': pick(0.5), 'p95': pick(0.95), 'max': round(samples[-1] * 1000, 2),
+                    } if samples else None,
+                }
+            return {'queue_depth': sum(e['queue_depth'] for e in endpoints.values()),
+                    'running': sum(e['running'] for e in endpoints.values()),
+                    'endpoints': endpoints}
+
+
+class DonutService:
+    def __init__(self, berry_file=BERRY_FILE, workers=WORKERS):
+        self.berries = load_berries(berry_file)
+        # spawn, not fork: the pool would otherwise fork from handler threads
+        context = multiprocessing.get_context("spawn")
+        warmed = context.Semaphore(0)
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                        initializer=_init_worker,
+                                        initargs=(berry_file, INPUT_FILE, warmed))
+        # Workers start on demand: one no-op each starts them all, then wait
+        # until every one has been through _init_worker
+        for future in [self.pool.submit(_noop) for _ in range(workers)]:
+            future.result()
+        for _ in range(workers):
+            warmed.acquire()
+        # Requests only reach the pool once a worker is free, so the ones
+        # waiting on this semaphore are exactly the queue
+        self.free_workers = threading.BoundedSemaphore(workers)
+        self.metrics = Metrics()
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        # Read-only after this, so handler threads can share it
+        self.count_table = count_berry_recipes(self.berries, MAX_COUNT_BERRIES)
+
+    def cached(self, key):
+        with self.cache_lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+        return None
+
+    def remember(self, key, result):
+        with self.cache_lock:
+            self.cache[key] = result
+            self.cache.move_to_end(key)
+            while len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(last=False)
+
+    def submit(self, endpoint, task, params, timeout):
+        """Run task on the pool; returns (status, payload, from_cache)."""
+        key = (endpoint, json.dumps(params, sort_keys=True))
+        hit = self.cached(key)
+        if hit is not None:
+            return 200, hit, True
+
+        deadline = time.time() + timeout
+        got_worker = self.free_workers.acquire(blocking=False)
+        if not got_worker:
+            self.metrics.waiting(endpoint, 1)
+            got_worker = self.free_workers.acquire(timeout=timeout)
+            self.metrics.waiting(endpoint, -1)
+        if not got_worker:
+            return 504, {'error': f"no worker was free within {timeout}s"}, False
+
+        def finished(_):
+            # The worker stays taken until the task really ends, even if
+            # the request gave up on it
+            self.metrics.running(endpoint, -1)
+            self.free_workers.release()
+
+        self.metrics.running(endpoint, 1)
+        try:
+            future = self.pool.submit(task, params, deadline)
+        except Exception:
+            finished(None)
+            raise
+        future.add_done_callback(finished)
+        try:
+            # Tasks watch the deadline themselves; the grace covers result transfer
+            result = future.result(timeout=max(deadline - time.time(), 0) + 1)
+        except FutureTimeout:
+            return 504, {'error': f"no answer within {timeout}s"}, False
+        except Exception as e:
+            return 500, {'error': f"{type(e).__name__}: {e}"}, False
+
+        # Only finished answers are reusable; partial ones depend on timing
+        if result['complete']:
+            self.remember(key, result)
+        return 200, result, False
+
+    def count(self, body):
+        max_berries = _int(body, 'max_berries', 8, low=1, high=MAX_COUNT_BERRIES)
+        min_berries = _int(body, 'min_berries', min(3, max_berries), low=0, high=max_berries)
+        target = _int(body, 'target', 0)
+        include_stars = _choice_list(body, 'include_stars', list(range(6)))
+        table = self.count_table
+        sizes = range(min_berries, max_berries + 1)
+        return {
+            'matching': count_matching(table, sizes, target, include_stars),
+            'by_size': {size: count_by_stars(table, size) for size in sizes},
+        }
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self, status, payload):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                self.reply(200, service.metrics.snapshot())
+            elif self.path == '/health':
+                self.reply(200, {'status': 'ok', 'berries': len(service.berries)})
+            else:
+                self.reply(404, {'error': f"unknown endpoint {self.path}"})
+
+        def do_POST(self):
+            start = time.perf_counter()
+            endpoint = self.path
+            status, payload, cached = 404, {'error': f"unknown endpoint {endpoint}"}, False
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+                if not isinstance(body, dict):
+                    raise ValueError("request body must be a JSON object")
+                if endpoint == '/find':
+                    status, payload, cached = service.submit(endpoint, run_find, parse_find(body), _timeout(body))
+                elif endpoint == '/solve':
+                    status, payload, cached = service.submit(endpoint, run_solve, parse_solve(body), _timeout(body))
+                elif endpoint == '/count':
+                    status, payload = 200, service.count(body)
+            except ValueError as e:   # includes json.JSONDecodeError
+                status, payload = 400, {'error': str(e)}
+            except Exception as e:
+                status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+            try:
+                self.reply(status, payload)
+            finally:
+                service.metrics.record(endpoint, status, time.perf_counter() - start, cached)
+
+        def log_message(self, format, *args):
+            pass  # keep the console for the startup line and errors
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve donut find/solve/count queries over HTTP/JSON.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--berries", default=BERRY_FILE)
+    args = parser.parse_args()
+
+    service = DonutService(args.berries, args.workers)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"Serving {len(service.berries)} berries on http://{args.host}:{args.port} "
+          f"with {args.workers} workers (POST /find /solve /count, GET /metrics /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.pool.shutdown(cancel_futures=True)
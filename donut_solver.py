@@ -1,10 +1,19 @@
-import pandas as pd
-import numpy as np
+import argparse
+import csv
+import hashlib
 import itertools
+import json
+import math
+import multiprocessing
 from collections import Counter
 import os
 import time
-from scipy.special import comb as combinations_with_replacement
+import search_kernel
+
+try:
+    import numpy as np  # only needed for ENGINE = "numpy"
+except ImportError:
+    np = None
 
 # --- CONFIGURATION ---
 # INPUT_FILE = '4star_berries.csv'          # File in the same directory
@@ -16,6 +25,13 @@ MIN_THRESHOLD = 400                  # Threshold ONLY applies to the value(s) th
 TARGET_MATCH_COUNT = 2              # E.g., 2 means we need at least 2 identical scores
 REPORT_INTERVAL = 10000             # Report progress every N combinations checked
 MAX_RESULTS = 50                 # Maximum number of results to find before stopping
+TIME_LIMIT = None                # Stop scanning after this many seconds (None = no limit)
+ENGINE = "delta"                 # "delta" (pure Python, prefix sums), "numpy" (np.sum per combination)
+                                 # or "kernel" (search_kernel, Numba-compiled when installed)
+USE_JIT = None                   # "kernel" engine: None = auto, True = force Numba, False = force pure Python
+BENCHMARK = False                # Time delta, numpy, kernel and numba (when installed) on the first
+                                 # BENCHMARK_SIZE combinations instead of solving
+BENCHMARK_SIZE = 200000
 
 # New Parameter: The match MUST involve a score from this list.
 # 1. Use a list of one or more scores: e.g., ["Sweet Score"]
@@ -24,60 +40,246 @@ MAX_RESULTS = 50                 # Maximum number of results to find before stop
 # 2. Use "All" to not restrict which scores can be part of the match.
 # TARGET_SCORE_NAMES = ["Sweet"] 
 TARGET_SCORE_NAMES = "All" 
+
+# Sharded, resumable scans: python donut_solver.py shard I N | shards N | merge N
+STATE_DIR = 'output/solver_state'   # One checkpoint file per shard (copy these between machines)
+CHECKPOINT_INTERVAL = 30            # Seconds between checkpoints while a shard runs
 # ---------------------
 
-def solve_recipes():
-    # 1. Load and Prepare Data
-    if not os.path.exists(INPUT_FILE):
-        print(f"Error: '{INPUT_FILE}' not found. Please verify the file path.")
+SCORE_COLUMNS = ["Sweet Score", "Spicy Score", "Sour Score", "Bitter Score", "Fresh Score"]
+
+
+def load_items(file_path):
+    # Plain csv keeps the delta engine free of pandas/NumPy
+    items = []
+    with open(file_path, mode='r', newline='') as f:
+        for row in csv.DictReader(f):
+            items.append({
+                "name": row["Berry Name"],
+                "scores": tuple(int(row[col]) for col in SCORE_COLUMNS)
+            })
+    return items
+
+
+# --- ENUMERATION ENGINES ---
+# Both walk the multisets in itertools.combinations_with_replacement order
+# and yield (indices, totals): five plain ints for "delta", a NumPy vector
+# for "numpy". The indices list may be reused between yields, so copy it if
+# you keep it.
+
+def iter_combo_totals_delta(items, r):
+    """Pure-Python walk keeping the flavor sums of every prefix depth.
+
+    Moving to the next multiset only rebuilds the prefixes from the first
+    index that changed, which is almost always just the last position, so
+    each combination costs five additions instead of a fresh sum.
+    """
+    n = len(items)
+    if n == 0:
+        return
+    if r == 0:
+        yield [], (0, 0, 0, 0, 0)
         return
 
-    df = pd.read_csv(INPUT_FILE)
-    score_columns = ["Sweet Score", "Spicy Score", "Sour Score", "Bitter Score", "Fresh Score"]
-    flavor_score = 0
-    
-    # 1a. Validate and Set up Target Scores
-    global TARGET_SCORE_NAMES
+    scores = [item['scores'] for item in items]
+    idx = [0] * r
+    # prefix[d] = flavor totals of idx[:d]
+    prefix = [(0, 0, 0, 0, 0)] * r
+    last = r - 1
+
+    def rebuild(depth):
+        for d in range(max(depth, 1), r):
+            p, s = prefix[d - 1], scores[idx[d - 1]]
+            prefix[d] = (p[0] + s[0], p[1] + s[1], p[2] + s[2], p[3] + s[3], p[4] + s[4])
+
+    rebuild(0)
+    while True:
+        b0, b1, b2, b3, b4 = prefix[last]
+        for j in range(idx[last], n):
+            idx[last] = j
+            s = scores[j]
+            yield idx, (b0 + s[0], b1 + s[1], b2 + s[2], b3 + s[3], b4 + s[4])
+
+        # Carry: bump the deepest position that isn't at the last item yet
+        d = last - 1
+        while d >= 0 and idx[d] == n - 1:
+            d -= 1
+        if d < 0:
+            return
+        v = idx[d] + 1
+        for j in range(d, r):
+            idx[j] = v
+        rebuild(d + 1)
+
+
+def iter_combo_totals_numpy(items, r):
+    """The original loop: stack every combination and np.sum it.
+
+    Totals stay a NumPy vector, as before, for match_values_counter.
+    """
+    arrays = [np.array(item['scores'], dtype=int) for item in items]
+    for combo in itertools.combinations_with_replacement(range(len(items)), r):
+        vectors = np.array([arrays[i] for i in combo])
+        total_scores = np.sum(vectors, axis=0)
+        yield combo, total_scores
+
+
+def match_values(totals, target_score_indices, min_threshold, match_count):
+    """Values shared by >= match_count of the five totals, at or above the
+    threshold, that also appear in one of the targeted scores."""
+    found = []
+    for v in totals:
+        if (v >= min_threshold and v not in found and totals.count(v) >= match_count
+                and any(totals[i] == v for i in target_score_indices)):
+            found.append(v)
+    return found
+
+
+def match_values_counter(total_scores, target_score_indices, min_threshold, match_count):
+    """The original match test on a NumPy totals vector, kept as the
+    comparison baseline for the "numpy" engine."""
+    # We now check all 5 scores for duplicates
+    score_counts = Counter(total_scores)
+
+    # Find all values that meet the criteria (MATCH COUNT & THRESHOLD)
+    all_potential_match_values = [
+        val for val, count in score_counts.items()
+        if count >= match_count and val >= min_threshold
+    ]
+
+    if not all_potential_match_values:
+        return []
+
+    # Check if ANY of the potential match values is present in the target score values
+    target_score_values = total_scores[target_score_indices]
+    return [
+        match_val for match_val in all_potential_match_values
+        if match_val in target_score_values
+    ]
+
+
+# Each engine yields totals in the form its match test expects
+ENGINES = {
+    "delta": (iter_combo_totals_delta, match_values),
+    "numpy": (iter_combo_totals_numpy, match_values_counter),
+}
+
+
+def benchmark_engines(items, r, limit):
+    print(f"Benchmark: first {limit:,} combinations of {len(items)} entries, size {r}")
+    target_score_indices = list(range(len(SCORE_COLUMNS)))
+    for name, (engine, matcher) in ENGINES.items():
+        if name == "numpy" and np is None:
+            print(f"  {name:>6}: skipped (NumPy not installed)")
+            continue
+        start_time = time.perf_counter()
+        checked = matches = 0
+        for _, totals in itertools.islice(engine(items, r), limit):
+            checked += 1
+            if matcher(totals, target_score_indices, MIN_THRESHOLD, TARGET_MATCH_COUNT):
+                matches += 1
+        elapsed = time.perf_counter() - start_time
+        print(f"  {name:>6}: {elapsed:.2f}s ({checked / elapsed:,.0f} combinations/s, {matches:,} matches)")
+
+    for jit in (False, True):
+        name = "numba" if jit else "kernel"
+        if jit and search_kernel.numba is None:
+            print(f"  {name:>6}: skipped (Numba not installed)")
+            continue
+        # Warm-up call so compilation isn't timed
+        search_kernel.scan_combinations(items, r, search_kernel.start_index(r, jit), 1,
+                                        MIN_THRESHOLD, TARGET_MATCH_COUNT, target_score_indices, use_jit=jit)
+        idx = search_kernel.start_index(r, jit)
+        start_time = time.perf_counter()
+        checked, _, matches = search_kernel.scan_combinations(
+            items, r, idx, limit, MIN_THRESHOLD, TARGET_MATCH_COUNT, target_score_indices, use_jit=jit)
+        elapsed = time.perf_counter() - start_time
+        print(f"  {name:>6}: {elapsed:.2f}s ({checked / elapsed:,.0f} combinations/s, {len(matches):,} matches)")
+
+def resolve_target_scores():
+    """Turn TARGET_SCORE_NAMES into (indices, display name), or None if invalid."""
+    score_columns = SCORE_COLUMNS
     if isinstance(TARGET_SCORE_NAMES, str) and TARGET_SCORE_NAMES.lower() == "all":
         # If "all" is set, the filter is effectively off.
-        target_score_indices = list(range(len(score_columns)))
-        target_score_names_display = "ALL"
+        return list(range(len(score_columns))), "ALL"
     elif isinstance(TARGET_SCORE_NAMES, list):
         if not all(name in score_columns for name in TARGET_SCORE_NAMES):
             print(f"Error: TARGET_SCORE_NAMES contains invalid column names.")
             print(f"Valid options are: {score_columns}")
-            return
-        target_score_indices = [score_columns.index(name) for name in TARGET_SCORE_NAMES]
-        target_score_names_display = TARGET_SCORE_NAMES
+            return None
+        return [score_columns.index(name) for name in TARGET_SCORE_NAMES], TARGET_SCORE_NAMES
     else:
         print("Error: TARGET_SCORE_NAMES must be a list of score names or the string 'All'.")
+        return None
+
+
+def print_recipe(number, items, combo, total_scores, valid_match_values):
+    print("\n" + "=" * 50)
+    print(f"✨ RECIPE #{number} FOUND!")
+    
+    names = [items[i]['name'] for i in combo]
+    ingredient_counts = Counter(names)
+    quantity_str = ", ".join([f"{qty}x {name}" for name, qty in ingredient_counts.items()])
+    
+    # Full score map for clarity
+    full_score_map = dict(zip(SCORE_COLUMNS, total_scores))
+
+    print(f"Ingredients: {quantity_str}")
+    print(f"Final Scores: {full_score_map}")
+    print(f"Success Logic: The value(s) {valid_match_values} appeared {TARGET_MATCH_COUNT}+ times (incl. a targeted score) and met the threshold.")
+    print("=" * 50)
+
+
+def solve_recipes():
+    # 1. Load and Prepare Data
+    if not os.path.exists(INPUT_FILE):
+        print(f"Error: '{INPUT_FILE}' not found. Please verify the file path.")
         return
 
-    # Extract data
-    items = []
-    for _, row in df.iterrows():
-        items.append({
-            "name": row["Berry Name"],
-            "scores": row[score_columns].to_numpy(dtype=int)
-        })
+    if ENGINE not in ENGINES and ENGINE != "kernel":
+        print(f"Error: ENGINE must be one of {list(ENGINES) + ['kernel']}.")
+        return
+    if ENGINE == "kernel" and USE_JIT and search_kernel.numba is None:
+        print("Error: USE_JIT = True needs Numba (pip install numba).")
+        return
+    if ENGINE == "numpy" and np is None:
+        print("Error: ENGINE = 'numpy' needs NumPy (pip install numpy); use 'delta' instead.")
+        return
+
+    items = load_items(INPUT_FILE)
+    
+    # 1a. Validate and Set up Target Scores
+    target_scores = resolve_target_scores()
+    if target_scores is None:
+        return
+    target_score_indices, target_score_names_display = target_scores
 
     N = len(items) 
     R = SELECTION_SIZE 
-    total_combinations = int(combinations_with_replacement(N + R - 1, R))
+    if BENCHMARK:
+        benchmark_engines(items, R, BENCHMARK_SIZE)
+        return
+
+    total_combinations = math.comb(N + R - 1, R)
     
     print("-" * 50)
     print(f"Data: {N} entries | Selection Size: {R}")
     print(f"Total Combinations to check: {total_combinations:,}")
     print(f"Goal: Find {TARGET_MATCH_COUNT} identical scores (>= {MIN_THRESHOLD})")
     print(f"Filter: The match MUST involve one of these scores: {target_score_names_display}")
+    if ENGINE == "kernel":
+        print(f"Engine: kernel ({'Numba' if search_kernel.jit_enabled(USE_JIT) else 'pure Python'})")
+    else:
+        print(f"Engine: {ENGINE}")
     print("-" * 50)
 
 
     # 2. Setup Generator and Timer
-    comb_gen = itertools.combinations_with_replacement(items, R)
     matches_found = 0
     combinations_checked = 0
     start_time = time.time()
+    deadline = None if TIME_LIMIT is None else start_time + TIME_LIMIT
+    timed_out = False
     
     # Time formatting helper (simplified)
     def format_time(seconds):
@@ -87,87 +289,327 @@ def solve_recipes():
         h, m = divmod(m, 60)
         return f"{h:02d}h {m:02d}m {s:02d}s"
 
-    
-    for combo in comb_gen:
-        combinations_checked += 1
+    # --- PROGRESS REPORTING --- (returns True once the time limit is hit)
+    def report_progress():
+        nonlocal timed_out
+        elapsed_time = time.time() - start_time
+        progress_percent = (combinations_checked / total_combinations) * 100
         
-        # --- PROGRESS REPORTING ---
-        if combinations_checked % REPORT_INTERVAL == 0:
-            elapsed_time = time.time() - start_time
-            progress_percent = (combinations_checked / total_combinations) * 100
-            
-            if progress_percent > 0:
-                estimated_total_time = elapsed_time / (combinations_checked / total_combinations)
-                time_remaining = estimated_total_time - elapsed_time
-            else:
-                time_remaining = float('inf')
+        if progress_percent > 0:
+            estimated_total_time = elapsed_time / (combinations_checked / total_combinations)
+            time_remaining = estimated_total_time - elapsed_time
+        else:
+            time_remaining = float('inf')
 
-            print(f"| Progress: {progress_percent:6.2f}% | Checked: {combinations_checked:,} | Time Remaining: {format_time(time_remaining)}", end='\r')
+        print(f"| Progress: {progress_percent:6.2f}% | Checked: {combinations_checked:,} | Time Remaining: {format_time(time_remaining)}", end='\r')
 
+        if deadline is not None and time.time() >= deadline:
+            timed_out = True
+            print(f"\n(Stopping after the {TIME_LIMIT}s time limit.)")
+        return timed_out
 
-        # 3. Solver Logic (Check ALL 5 scores for a match)
-        vectors = np.array([item['scores'] for item in combo])
-        total_scores = np.sum(vectors, axis=0)
+    # Print one recipe (returns True once MAX_RESULTS is reached)
+    def report_match(combo, total_scores, valid_match_values):
+        nonlocal matches_found
+        matches_found += 1
         
-        # We now check all 5 scores for duplicates
-        score_counts = Counter(total_scores)
+        # Print the final result
+        print_recipe(matches_found, items, combo, total_scores, valid_match_values)
         
-        # Find all values that meet the criteria (MATCH COUNT & THRESHOLD)
-        all_potential_match_values = [
-            val for val, count in score_counts.items() 
-            if count >= TARGET_MATCH_COUNT and val >= MIN_THRESHOLD
-        ]
-        
-        if not all_potential_match_values:
-            continue # No match was found anywhere, skip to next combination
+        # Optional: Stop after hitting max results
+        if matches_found >= MAX_RESULTS:
+            print(f"\n(Stopping after {MAX_RESULTS} results.)")
+            return True
+        return False
 
-        # 4. Filter Logic (Does the match include a target score?)
-        
-        # Get the actual scores in the combination that are targeted (Sweet, Spicy, etc.)
-        target_score_values = total_scores[target_score_indices]
-        
-        # Check if ANY of the potential match values is present in the target score values
-        valid_match_values = [
-            match_val for match_val in all_potential_match_values
-            if match_val in target_score_values
-        ]
-        
-        # If valid_match_values is not empty, it means we found a match AND the value
-        # is present in one of the required target scores.
-        if valid_match_values:
-            matches_found += 1
-            
-            # Print the final result
-            print("\n" + "=" * 50)
-            print(f"✨ RECIPE #{matches_found} FOUND!")
-            
-            names = [item['name'] for item in combo]
-            ingredient_counts = Counter(names)
-            quantity_str = ", ".join([f"{qty}x {name}" for name, qty in ingredient_counts.items()])
+    if ENGINE == "kernel":
+        # The kernel checks REPORT_INTERVAL combinations per call and only
+        # hands back the matches, which are re-scored here for printing
+        jit = search_kernel.jit_enabled(USE_JIT)
+        idx = search_kernel.start_index(R, jit)
+        done = False
+        while not done:
+            checked, done, matches = search_kernel.scan_combinations(
+                items, R, idx, REPORT_INTERVAL, MIN_THRESHOLD, TARGET_MATCH_COUNT,
+                target_score_indices, max_matches=MAX_RESULTS - matches_found, use_jit=jit)
+            combinations_checked += checked
+            stop = False
+            for combo in matches:
+                total_scores = tuple(sum(items[i]['scores'][j] for i in combo) for j in range(5))
+                valid_match_values = match_values(total_scores, target_score_indices,
+                                                  MIN_THRESHOLD, TARGET_MATCH_COUNT)
+                stop = report_match(combo, total_scores, valid_match_values)
+            if stop or report_progress():
+                break
+
+    else:
+        engine, matcher = ENGINES[ENGINE]
+        for combo, total_scores in engine(items, R):
+            combinations_checked += 1
             
-            # Full score map for clarity
-            full_score_map = dict(zip(score_columns, total_scores))
+            if combinations_checked % REPORT_INTERVAL == 0 and report_progress():
+                break
 
-            print(f"Ingredients: {quantity_str}")
-            print(f"Final Scores: {full_score_map}")
-            print(f"Success Logic: The value(s) {valid_match_values} appeared {TARGET_MATCH_COUNT}+ times (incl. a targeted score) and met the threshold.")
-            print("=" * 50)
+            # 3. Solver Logic (Check ALL 5 scores for a match, incl. a targeted score)
+            valid_match_values = matcher(total_scores, target_score_indices,
+                                         MIN_THRESHOLD, TARGET_MATCH_COUNT)
             
-            # Optional: Stop after hitting max results
-            if matches_found >= MAX_RESULTS:
-                print(f"\n(Stopping after {MAX_RESULTS} results.)")
+            # If valid_match_values is not empty, it means we found a match AND the value
+            # is present in one of the required target scores.
+            if valid_match_values and report_match(combo, total_scores, valid_match_values):
                 break
 
     # Final Summary
     print("\n" + "#" * 50)
     print(f"Scan complete. Total time taken: {format_time(time.time() - start_time)}")
     print(f"Total combinations checked: {combinations_checked:,}")
+    if timed_out:
+        print(f"Coverage: {combinations_checked / total_combinations * 100:.2f}% of all combinations (time limit reached)")
     print(f"Total recipes found: {matches_found}")
     print("#" * 50)
 
+# --- RESUMABLE, SHARDED SCANS ---
+# Multisets are numbered in combinations_with_replacement order, so a scan
+# is just a rank range: shards split [0, total) into equal pieces and a
+# checkpoint only needs the next rank to check.
+
+def multiset_count(n, r):
+    """Number of size-r multisets drawn from n items."""
+    if n == 0:
+        return 1 if r == 0 else 0
+    return math.comb(n + r - 1, r)
+
+
+def rank_multiset(combo, n):
+    """Position of a sorted index tuple in combinations_with_replacement(range(n), r)."""
+    r = len(combo)
+    rank = 0
+    low = 0
+    for d, c in enumerate(combo):
+        for v in range(low, c):
+            rank += multiset_count(n - v, r - d - 1)
+        low = c
+    return rank
+
+
+def unrank_multiset(rank, n, r):
+    """Inverse of rank_multiset."""
+    if not 0 <= rank < multiset_count(n, r):
+        raise ValueError(f"rank {rank} is outside [0, {multiset_count(n, r)}) for n={n}, r={r}")
+    combo = []
+    low = 0
+    for d in range(r):
+        v = low
+        while rank >= multiset_count(n - v, r - d - 1):
+            rank -= multiset_count(n - v, r - d - 1)
+            v += 1
+        combo.append(v)
+        low = v
+    return combo
+
+
+def shard_bounds(total, num_shards, shard_index):
+    """[start, stop) rank range of one shard."""
+    return total * shard_index // num_shards, total * (shard_index + 1) // num_shards
+
+
+def shard_state_path(shard_index, num_shards):
+    return os.path.join(STATE_DIR, f"shard_{shard_index + 1}_of_{num_shards}.json")
+
+
+def table_hash(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def scan_settings(items):
+    # Everything that changes the answer; a checkpoint from other settings is not resumed.
+    # The table's size and hash catch a same-named file with other rows on another machine.
+    return {
+        "input_file": INPUT_FILE,
+        "item_count": len(items),
+        "table_sha256": table_hash(INPUT_FILE),
+        "selection_size": SELECTION_SIZE,
+        "min_threshold": MIN_THRESHOLD,
+        "target_match_count": TARGET_MATCH_COUNT,
+        "target_score_names": TARGET_SCORE_NAMES,
+        "max_results": MAX_RESULTS,   # state files keep only the first MAX_RESULTS matches
+    }
+
+
+def save_state(path, state):
+    # Write then rename so an interrupted save never leaves half a file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def run_shard(shard_index, num_shards):
+    """
+    Scan one shard's rank range, checkpointing to its state file.
+
+    Rerunning the same shard resumes from the last checkpoint. Each shard
+    keeps its first MAX_RESULTS matches (by rank) and counts the rest, so
+    merging the shards gives the same first MAX_RESULTS as a single scan.
+    """
+    if not os.path.exists(INPUT_FILE):
+        print(f"Error: '{INPUT_FILE}' not found. Please verify the file path.")
+        return
+    if not 0 <= shard_index < num_shards:
+        print(f"Error: shard index must be between 1 and {num_shards}.")
+        return
+    target_scores = resolve_target_scores()
+    if target_scores is None:
+        return
+    target_score_indices = target_scores[0]
+
+    items = load_items(INPUT_FILE)
+    N = len(items)
+    R = SELECTION_SIZE
+    start, stop = shard_bounds(multiset_count(N, R), num_shards, shard_index)
+    label = f"Shard {shard_index + 1}/{num_shards}"
+
+    os.makedirs(STATE_DIR, exist_ok=True)
+    path = shard_state_path(shard_index, num_shards)
+    state = load_state(path)
+    settings = scan_settings(items)
+    if state is not None and (state["settings"] != settings or
+                              (state["start"], state["stop"]) != (start, stop)):
+        print(f"{label}: {path} was written with other settings, starting over.")
+        state = None
+    if state is None:
+        state = {"settings": settings, "start": start, "stop": stop,
+                 "next_rank": start, "matches_total": 0, "matches": []}
+    elif state["next_rank"] > start:
+        print(f"{label}: resuming at rank {state['next_rank']:,} of [{start:,}, {stop:,})")
+
+    jit = search_kernel.jit_enabled(USE_JIT)
+    idx = None
+    if state["next_rank"] < stop:
+        idx = search_kernel.start_index(R, jit, unrank_multiset(state["next_rank"], N, R))
+    last_save = time.time()
+    try:
+        while state["next_rank"] < stop:
+            limit = min(REPORT_INTERVAL, stop - state["next_rank"])
+            checked, _, matches = search_kernel.scan_combinations(
+                items, R, idx, limit, MIN_THRESHOLD, TARGET_MATCH_COUNT,
+                target_score_indices, use_jit=jit)
+            # Build the next state first and swap it in with one assignment, so
+            # a Ctrl-C never saves a rank without that chunk's matches
+            room = max(MAX_RESULTS - len(state["matches"]), 0)
+            state = dict(state,
+                         next_rank=state["next_rank"] + checked,
+                         matches_total=state["matches_total"] + len(matches),
+                         matches=state["matches"] + [list(combo) for combo in matches[:room]])
+
+            if time.time() - last_save >= CHECKPOINT_INTERVAL:
+                save_state(path, state)
+                last_save = time.time()
+                done = (state["next_rank"] - start) / max(stop - start, 1) * 100
+                print(f"{label}: {done:6.2f}% | next rank {state['next_rank']:,} | "
+                      f"matches {state['matches_total']:,}")
+    except KeyboardInterrupt:
+        save_state(path, state)
+        print(f"\n{label}: interrupted, progress saved to {path}")
+        return
+
+    save_state(path, state)
+    print(f"{label}: complete ({stop - start:,} combinations, {state['matches_total']:,} matches) -> {path}")
+
+
+def run_shards(num_shards):
+    """Run every shard as a local process, then merge."""
+    workers = [multiprocessing.Process(target=run_shard, args=(i, num_shards))
+               for i in range(num_shards)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        # Each shard saves its own checkpoint on Ctrl-C
+        for worker in workers:
+            worker.join()
+        return
+    merge_shards(num_shards)
+
+
+def merge_shards(num_shards):
+    """Combine the shard state files into one report."""
+    if not os.path.exists(INPUT_FILE):
+        print(f"Error: '{INPUT_FILE}' not found. Please verify the file path.")
+        return
+    target_scores = resolve_target_scores()
+    if target_scores is None:
+        return
+    target_score_indices = target_scores[0]
+
+    items = load_items(INPUT_FILE)
+    settings = scan_settings(items)
+    total = multiset_count(len(items), SELECTION_SIZE)
+    states = []
+    for i in range(num_shards):
+        state = load_state(shard_state_path(i, num_shards))
+        if state is None:
+            print(f"Error: missing state file for shard {i + 1}/{num_shards} in '{STATE_DIR}'.")
+            return
+        if state["settings"] != settings:
+            print(f"Error: shard {i + 1}/{num_shards} was run with different settings or another '{INPUT_FILE}'.")
+            return
+        if (state["start"], state["stop"]) != shard_bounds(total, num_shards, i):
+            print(f"Error: shard {i + 1}/{num_shards} covers [{state['start']:,}, {state['stop']:,}), "
+                  f"not its range for {num_shards} shards.")
+            return
+        states.append(state)
+    checked = sum(state["next_rank"] - state["start"] for state in states)
+    matches_total = sum(state["matches_total"] for state in states)
+    unfinished = [i + 1 for i, state in enumerate(states) if state["next_rank"] < state["stop"]]
+
+    # Shards hold consecutive rank ranges, so concatenating keeps rank order
+    matches = [combo for state in states for combo in state["matches"]][:MAX_RESULTS]
+    for number, combo in enumerate(matches, start=1):
+        total_scores = tuple(sum(items[i]['scores'][j] for i in combo) for j in range(5))
+        valid_match_values = match_values(total_scores, target_score_indices,
+                                          MIN_THRESHOLD, TARGET_MATCH_COUNT)
+        print_recipe(number, items, combo, total_scores, valid_match_values)
+
+    print("\n" + "#" * 50)
+    print(f"Merged {num_shards} shards: {checked:,} of {total:,} combinations checked")
+    if unfinished:
+        print(f"Unfinished shards: {unfinished} (rerun them to resume)")
+    print(f"Total recipes found: {matches_total:,} (showing the first {len(matches)})")
+    print("#" * 50)
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find berry combinations with matching flavor scores.")
+    commands = parser.add_subparsers(dest="command")
+    shard_cmd = commands.add_parser("shard", help="scan (or resume) shard I of N")
+    shard_cmd.add_argument("index", type=int)
+    shard_cmd.add_argument("count", type=int)
+    shards_cmd = commands.add_parser("shards", help="run all N shards as local processes, then merge")
+    shards_cmd.add_argument("count", type=int)
+    merge_cmd = commands.add_parser("merge", help="merge the state files of N shards")
+    merge_cmd.add_argument("count", type=int)
+    args = parser.parse_args()
+
     try:
-        solve_recipes()
+        if args.command == "shard":
+            run_shard(args.index - 1, args.count)
+        elif args.command == "shards":
+            run_shards(args.count)
+        elif args.command == "merge":
+            merge_shards(args.count)
+        else:
+            solve_recipes()
     except Exception as e:
         print(f"\nAn error occurred: {e}")
-        print("Please ensure you have installed the necessary libraries: pip install pandas numpy scipy")
\ No newline at end of file
+        print("Please ensure you have installed the necessary libraries: pip install numpy (ENGINE = 'numpy'), numba (optional, ENGINE = 'kernel')")
\ No newline at end of file
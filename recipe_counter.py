@@ -0,0 +1,98 @@
+import math
+import time
+from tabulate import tabulate # pip install tabulate
+
+from berry_data import load_berries, get_star_rating, starRatings
+
+
+# ----------------------------------------------------
+# Counting recipes without enumerating them
+# ----------------------------------------------------
+def count_recipes(flavors, max_size, counts=None):
+    """
+    Count recipes by size and flavor total with polynomial convolution.
+
+    flavors holds each berry's total flavor, counts its inventory (None means
+    unlimited, like itertools.combinations_with_replacement). Returns a list
+    where table[k] is a dict {flavor_total: number of distinct recipes of
+    exactly k berries}, for k = 0..max_size.
+    """
+    # Work in units of the scores' gcd to keep the arrays short
+    step = math.gcd(*flavors) or 1
+    units = [f // step for f in flavors]
+    width = max(units, default=0) * max_size + 1
+
+    # table[k][u]: recipes of k berries whose flavor total is u * step
+    table = [[0] * width for _ in range(max_size + 1)]
+    table[0][0] = 1
+
+    for i, u in enumerate(units):
+        cap = max_size if counts is None else min(counts[i], max_size)
+        if cap == 0:
+            continue
+        old = [row[:] for row in table]
+        # Multiply by 1 + x*y^u + ... + (x*y^u)^cap one size at a time:
+        # new[k] = old[k] + new[k-1] shifted by u, minus the terms that
+        # would use this berry more than cap times
+        for k in range(1, max_size + 1):
+            new_k, prev = table[k], table[k - 1]
+            drop = old[k - cap - 1] if k - cap - 1 >= 0 else None
+            drop_shift = (cap + 1) * u
+            for f in range(u, width):
+                val = new_k[f] + prev[f - u]
+                if drop is not None and f >= drop_shift:
+                    val -= drop[f - drop_shift]
+                new_k[f] = val
+
+    return [{f * step: n for f, n in enumerate(row) if n} for row in table]
+
+
+def count_berry_recipes(berries, max_size, respect_inventory=True):
+    """count_recipes over load_berries() tuples, optionally capped by Count."""
+    flavors = [b[2] for b in berries]
+    counts = [b[5] for b in berries] if respect_inventory else None
+    return count_recipes(flavors, max_size, counts)
+
+
+def count_by_stars(table, size):
+    """Number of recipes of the given size in each star bucket."""
+    stars = {rating: 0 for rating in range(len(starRatings))}
+    for flavor, n in table[size].items():
+        stars[get_star_rating(flavor)[0]] += n
+    return stars
+
+
+def count_matching(table, sizes, target=0, include_stars="all"):
+    """Recipes of any size in sizes with flavor >= target in include_stars."""
+    total = 0
+    for size in sizes:
+        for flavor, n in table[size].items():
+            if flavor >= target and (include_stars == "all" or get_star_rating(flavor)[0] in include_stars):
+                total += n
+    return total
+
+
+# ----------------------------------------------------
+# Histogram report
+# ----------------------------------------------------
+def histogram_report(table, sizes):
+    headers = ["Size"] + [f"{s}★" for s in range(len(starRatings))] + ["Total"]
+    rows = []
+    for size in sizes:
+        stars = count_by_stars(table, size)
+        rows.append([size] + [f"{stars[s]:,}" for s in sorted(stars)] + [f"{sum(stars.values()):,}"])
+    return tabulate(rows, headers=headers, tablefmt="github", stralign="right")
+
+
+if __name__ == "__main__":
+    berries = load_berries('hyper_berries.csv')
+    MIN_BERRIES = 3
+    MAX_BERRIES = 8
+
+    start_time = time.perf_counter()
+    table = count_berry_recipes(berries, MAX_BERRIES)
+    elapsed = time.perf_counter() - start_time
+
+    print(f"Recipes per size and star rating for {len(berries)} berries "
+          f"(respecting current inventory, counted in {elapsed:.3f}s)\n")
+    print(histogram_report(table, range(MIN_BERRIES, MAX_BERRIES + 1)))
@@ -0,0 +1,262 @@
+import time
+
+from berry_data import FLAVOR_NAMES, build_donut, starRatings
+
+try:
+    import numba # pip install numba (optional)
+    import numpy as np
+except ImportError:
+    numba = None
+    np = None
+
+# None: use Numba when installed, True: require it, False: always pure Python
+USE_JIT = None
+
+
+# ----------------------------------------------------
+# Kernels
+# ----------------------------------------------------
+# Both kernels only touch flat integer sequences and return one flat packed
+# list of ints, so the same code runs under numba.njit (NumPy arrays) and as
+# plain Python (lists). out[0] always holds the number of packed rows.
+
+def _find_kernel(scores, levels, cals, counts, tastes, num_berries, target,
+                 star_cuts, star_mask, flavor_mask):
+    """
+    Iterative version of the find_high_score_donuts search.
+
+    tastes is flat (berry * 5 + flavor). Each result row is
+    [flavor, levels, calories, sweet, spicy, sour, bitter, fresh, take_0 .. take_n-1].
+    """
+    n = len(scores)
+    out = [0]
+    best = target
+
+    # State on entering each position
+    rem = [0] * (n + 1)
+    fl = [0] * (n + 1)
+    lv = [0] * (n + 1)
+    ca = [0] * (n + 1)
+    ts = [0] * ((n + 1) * 5)
+    take = [0] * (n + 1)
+    max_take = [0] * (n + 1)
+
+    rem[0] = num_berries
+    take[0] = -1
+    pos = 0
+    while pos >= 0:
+        if take[pos] == -1:
+            if rem[pos] == 0:
+                if fl[pos] >= best:
+                    rating = -1
+                    for cut in star_cuts:
+                        if fl[pos] >= cut:
+                            rating += 1
+                    dominant = 0
+                    for j in range(1, 5):
+                        if ts[pos * 5 + j] > ts[pos * 5 + dominant]:
+                            dominant = j
+                    if star_mask[rating] and flavor_mask[dominant]:
+                        out[0] += 1
+                        out.append(fl[pos])
+                        out.append(lv[pos])
+                        out.append(ca[pos])
+                        for j in range(5):
+                            out.append(ts[pos * 5 + j])
+                        for i in range(n):
+                            out.append(take[i] if i < pos else 0)
+                        if fl[pos] > best:
+                            best = fl[pos]
+                pos -= 1
+                continue
+            # Pruning: can't reach target even if we take max of everything left
+            if pos == n or fl[pos] + scores[pos] * rem[pos] < best:
+                pos -= 1
+                continue
+            max_take[pos] = min(rem[pos], counts[pos])
+            take[pos] = 0
+        else:
+            take[pos] += 1
+            if take[pos] > max_take[pos]:
+                pos -= 1
+                continue
+
+        t = take[pos]
+        # Early break if even taking max future won't help
+        if t < max_take[pos] and fl[pos] + scores[pos] * rem[pos] < best:
+            pos -= 1
+            continue
+
+        rem[pos + 1] = rem[pos] - t
+        fl[pos + 1] = fl[pos] + t * scores[pos]
+        lv[pos + 1] = lv[pos] + t * levels[pos]
+        ca[pos + 1] = ca[pos] + t * cals[pos]
+        for j in range(5):
+            ts[(pos + 1) * 5 + j] = ts[pos * 5 + j] + t * tastes[pos * 5 + j]
+        take[pos + 1] = -1
+        pos += 1
+
+    return out
+
+
+def _scan_kernel(scores, n, r, idx, limit, min_threshold, match_count,
+                 target_mask, max_matches):
+    """
+    Check up to limit multisets starting at idx (the donut_solver match test).
+
+    scores is flat (item * 5 + flavor); idx is advanced in place so the next
+    call carries on where this one stopped. Returns
+    [matches, checked, done, match_0 indices .., match_1 indices ..].
+    """
+    out = [0, 0, 0]
+    prefix = [0] * (r * 5)
+    for d in range(1, r):
+        for j in range(5):
+            prefix[d * 5 + j] = prefix[(d - 1) * 5 + j] + scores[idx[d - 1] * 5 + j]
+
+    last = r - 1
+    base = last * 5
+    checked = 0
+    while checked < limit:
+        k = idx[last] * 5
+        totals = (prefix[base] + scores[k], prefix[base + 1] + scores[k + 1],
+                  prefix[base + 2] + scores[k + 2], prefix[base + 3] + scores[k + 3],
+                  prefix[base + 4] + scores[k + 4])
+        checked += 1
+
+        matched = False
+        for i in range(5):
+            v = totals[i]
+            if v < min_threshold:
+                continue
+            same = 0
+            targeted = False
+            for j in range(5):
+                if totals[j] == v:
+                    same += 1
+                    if target_mask[j]:
+                        targeted = True
+            if same >= match_count and targeted:
+                matched = True
+                break
+        if matched:
+            out[0] += 1
+            for d in range(r):
+                out.append(idx[d])
+
+        # Advance to the next multiset, rebuilding prefixes from the first change
+        if idx[last] < n - 1:
+            idx[last] += 1
+        else:
+            d = last - 1
+            while d >= 0 and idx[d] == n - 1:
+                d -= 1
+            if d < 0:
+                out[2] = 1
+                break
+            v = idx[d] + 1
+            for e in range(d, r):
+                idx[e] = v
+            for e in range(d + 1, r):
+                for j in range(5):
+                    prefix[e * 5 + j] = prefix[(e - 1) * 5 + j] + scores[idx[e - 1] * 5 + j]
+
+        if max_matches > 0 and out[0] >= max_matches:
+            break
+
+    out[1] = checked
+    return out
+
+
+if numba is not None:
+    _find_kernel_jit = numba.njit(cache=True)(_find_kernel)
+    _scan_kernel_jit = numba.njit(cache=True)(_scan_kernel)
+
+
+def jit_enabled(use_jit=None):
+    """Resolve a use_jit switch (None falls back to USE_JIT, then auto)."""
+    if use_jit is None:
+        use_jit = USE_JIT
+    if use_jit is None:
+        return numba is not None
+    if use_jit and numba is None:
+        raise ImportError("use_jit=True needs Numba: pip install numba")
+    return bool(use_jit)
+
+
+def _ints(values, jit):
+    return np.array(values, dtype=np.int64) if jit else list(values)
+
+
+# ----------------------------------------------------
+# Wrappers
+# ----------------------------------------------------
+def find_donuts_kernel(berries, target, num_berries=8, include_stars="all",
+                       include_flavors="all", use_jit=None):
+    """Drop-in for find_high_score_donuts backed by the flat-array kernel."""
+    start_time = time.perf_counter()
+    jit = jit_enabled(use_jit)
+
+    names = [b[1] for b in berries]
+    counts = [b[5] for b in berries]
+    n = len(berries)
+    star_mask = [int(include_stars == "all" or s in include_stars) for s in range(len(starRatings))]
+    flavor_mask = [int(include_flavors == "all" or f in include_flavors) for f in FLAVOR_NAMES]
+
+    kernel = _find_kernel_jit if jit else _find_kernel
+    packed = kernel(
+        _ints([b[2] for b in berries], jit),
+        _ints([b[3] for b in berries], jit),
+        _ints([b[4] for b in berries], jit),
+        _ints(counts, jit),
+        _ints([b[6 + j] for b in berries for j in range(5)], jit),
+        num_berries, target,
+        _ints(starRatings, jit), _ints(star_mask, jit), _ints(flavor_mask, jit),
+    )
+
+    width = 8 + n
+    results = []
+    for row in range(packed[0]):
+        rec = packed[1 + row * width: 1 + (row + 1) * width]
+        path = [i for i in range(n) for _ in range(rec[8 + i])]
+        results.append(build_donut(names, counts, path, *rec[:8]))
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Found {len(results):,} donuts ≥ {target} flavor in {elapsed:.2f} seconds "
+          f"({'Numba' if jit else 'pure Python'} kernel)")
+    if results:
+        print(f"Best flavor found: {max(r['flavor'] for r in results)}")
+
+    return results, elapsed
+
+
+def start_index(r, jit, combo=None):
+    """Multiset state for combo (default: the first combination) in the form
+    scan_combinations expects."""
+    return _ints([0] * r if combo is None else combo, jit)
+
+
+def scan_combinations(items, r, idx, limit, min_threshold, match_count,
+                      target_score_indices, max_matches=0, use_jit=None):
+    """
+    Run the donut_solver match test over the next limit multisets from idx.
+
+    idx comes from start_index (same jit setting) and is advanced in place.
+    Returns (checked, done, matches) where matches is a list of index tuples.
+    """
+    jit = jit_enabled(use_jit)
+    n = len(items)
+    if n == 0 or r == 0:
+        return 0, True, []
+
+    target_mask = [int(i in target_score_indices) for i in range(5)]
+    kernel = _scan_kernel_jit if jit else _scan_kernel
+    packed = kernel(
+        _ints([s for item in items for s in item['scores']], jit),
+        n, r, idx, limit, min_threshold, match_count,
+        _ints(target_mask, jit), max_matches,
+    )
+
+    matches = [tuple(int(i) for i in packed[3 + m * r: 3 + (m + 1) * r]) for m in range(packed[0])]
+    return packed[1], bool(packed[2]), matches
+